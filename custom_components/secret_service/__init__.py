@@ -5,7 +5,16 @@ https://github.com/amura11/ha-secret-service
 """
 from __future__ import annotations
 
-import bcrypt
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import TYPE_CHECKING
+
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 
@@ -20,6 +29,9 @@ from homeassistant.core import (
     SupportsResponse,
 )
 
+if TYPE_CHECKING:
+    from argon2 import PasswordHasher
+
 from .const import (
     DOMAIN,
     SETUP_KEY,
@@ -31,7 +43,28 @@ from .const import (
     ATTR_NAME,
     ATTR_VALUE,
     ATTR_FULL_RESPONSE,
+    ATTR_ALGORITHM,
+    ATTR_COST,
+    ALGORITHM_BCRYPT,
+    ALGORITHM_ARGON2,
+    ARGON2_MEMORY_COST,
+    ARGON2_TIME_COST,
+    ARGON2_PARALLELISM,
+    BCRYPT_MAX_LENGTH,
+    BCRYPT_MIN_COST,
+    BCRYPT_MAX_COST,
+    BCRYPT_MAX_CALIBRATED_COST,
+    BCRYPT_CALIBRATION_TARGET_MS,
+    BCRYPT_CALIBRATION_SAMPLES,
+    CACHE_MAX_SIZE,
+    CACHE_TTL,
+    MAX_VALUE_LENGTH,
+    MAX_FAILED_ATTEMPTS,
+    FAILED_ATTEMPTS_WINDOW,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_PER_SECOND,
     SERVICE_CHECK_SECRET,
+    VALIDATE_RESULT_NAMES,
     ValidateResult,
 )
 
@@ -39,12 +72,21 @@ SECRET_SCHEMA = vol.Schema(
     {
         vol.Required(ATTR_SECRET): cv.string,
         vol.Required(ATTR_VALUE): cv.string,
+        vol.Optional(ATTR_ALGORITHM, default=ALGORITHM_BCRYPT): vol.In(
+            [ALGORITHM_BCRYPT, ALGORITHM_ARGON2]
+        ),
+        vol.Optional(ATTR_COST): vol.All(
+            vol.Coerce(int), vol.Range(min=BCRYPT_MIN_COST, max=BCRYPT_MAX_COST)
+        ),
     }
 )
 
 GROUP_SCHEMA = vol.Schema(
     {
         vol.Required(ATTR_GROUP): cv.string,
+        vol.Optional(ATTR_COST): vol.All(
+            vol.Coerce(int), vol.Range(min=BCRYPT_MIN_COST, max=BCRYPT_MAX_COST)
+        ),
         vol.Required(ATTR_SECRETS): vol.All(cv.ensure_list, [SECRET_SCHEMA]),
     }
 )
@@ -66,13 +108,97 @@ CONFIG_SCHEMA = vol.Schema(
     extra=vol.ALLOW_EXTRA,
 )
 
-CHECK_SECRET_SCHEMA = vol.Schema(
-    {
-        vol.Required(ATTR_NAME): cv.string,
-        vol.Required(ATTR_VALUE): cv.string,
-        vol.Optional(ATTR_FULL_RESPONSE): cv.boolean,
+CHECK_SECRET_KEYS = frozenset((ATTR_NAME, ATTR_VALUE, ATTR_FULL_RESPONSE))
+
+
+def check_secret_schema(data: dict) -> dict:
+    """Validate check_secret service data.
+
+    This is called on every service call so it avoids the overhead of a full voluptuous
+    schema, only falling back to the config validation helpers for values that need coercing.
+    """
+    if not isinstance(data, dict):
+        raise vol.Invalid("expected a dictionary")
+
+    extra_keys = data.keys() - CHECK_SECRET_KEYS
+    if extra_keys:
+        raise vol.Invalid(f"extra keys not allowed: {', '.join(map(str, extra_keys))}")
+
+    try:
+        name = data[ATTR_NAME]
+        value = data[ATTR_VALUE]
+    except KeyError as err:
+        raise vol.Invalid(f"required key not provided: {err.args[0]}") from err
+
+    full_response = data.get(ATTR_FULL_RESPONSE, False)
+
+    return {
+        ATTR_NAME: name if isinstance(name, str) else cv.string(name),
+        ATTR_VALUE: value if isinstance(value, str) else cv.string(value),
+        ATTR_FULL_RESPONSE: (
+            full_response
+            if isinstance(full_response, bool)
+            else cv.boolean(full_response)
+        ),
     }
-)
+
+
+CHECK_SECRET_SCHEMA = check_secret_schema
+
+
+@cache
+def get_argon2_hasher() -> PasswordHasher:
+    """Get the shared Argon2 hasher, importing argon2 on first use."""
+    from argon2 import PasswordHasher
+
+    return PasswordHasher(
+        time_cost=ARGON2_TIME_COST,
+        memory_cost=ARGON2_MEMORY_COST,
+        parallelism=ARGON2_PARALLELISM,
+    )
+
+
+@cache
+def get_argon2_checker() -> Callable[[bytes, bytes], bool]:
+    """Get a function that checks a value against an Argon2 hash, like bcrypt.checkpw."""
+    from argon2.exceptions import VerifyMismatchError
+
+    hasher = get_argon2_hasher()
+
+    def check(value: bytes, hashed_value: bytes) -> bool:
+        try:
+            return hasher.verify(hashed_value, value)
+        except VerifyMismatchError:
+            return False
+
+    return check
+
+
+def calibrate_bcrypt_cost(target_ms: float = BCRYPT_CALIBRATION_TARGET_MS) -> int:
+    """Find the highest bcrypt cost that hashes within the target time on this host."""
+    import bcrypt
+
+    best_cost = BCRYPT_MIN_COST
+
+    for cost in range(BCRYPT_MIN_COST, BCRYPT_MAX_CALIBRATED_COST + 1):
+        salt = bcrypt.gensalt(rounds=cost)
+        elapsed_ms = float("inf")
+
+        # Use the fastest of a few runs so a busy CPU doesn't skew the cost too low
+        for _ in range(BCRYPT_CALIBRATION_SAMPLES):
+            start = time.perf_counter()
+            bcrypt.hashpw(b"x" * 16, salt)
+            elapsed_ms = min(elapsed_ms, (time.perf_counter() - start) * 1000)
+
+        # Each cost step doubles the time so there is no point trying higher costs
+        if elapsed_ms > target_ms:
+            break
+
+        best_cost = cost
+
+    LOGGER.debug("Calibrated bcrypt cost to %s", best_cost)
+
+    return best_cost
 
 
 async def async_setup(hass: HomeAssistant, config: ConfigEntry) -> bool:
@@ -83,7 +209,10 @@ async def async_setup(hass: HomeAssistant, config: ConfigEntry) -> bool:
         LOGGER.debug("Setup key present, skipping setup")
         return True
 
-    service: SecretValidatorService = SecretValidatorService(config[DOMAIN])
+    # Hashing the configured secrets is CPU bound so keep it off the event loop
+    service: SecretValidatorService = await hass.async_add_executor_job(
+        SecretValidatorService, config[DOMAIN]
+    )
     hass.data[SETUP_KEY] = True
 
     # Service handlers
@@ -96,18 +225,21 @@ async def async_setup(hass: HomeAssistant, config: ConfigEntry) -> bool:
         if (new_config is None) or (DOMAIN not in new_config):
             raise ValueError("A valid config could not be found")
 
-        service.reload(new_config[DOMAIN])
+        await hass.async_add_executor_job(service.reload, new_config[DOMAIN])
 
     async def async_handle_check_secret(call: ServiceCall) -> ServiceResponse:
         name: str = call.data.get(ATTR_NAME)
         value: str = call.data.get(ATTR_VALUE)
         use_full_response = call.data.get(ATTR_FULL_RESPONSE, False)
 
-        result: ValidateResult = service.validate(name, value)
+        # Hashing is CPU bound so keep it off the event loop
+        result: ValidateResult = await hass.async_add_executor_job(
+            service.validate, name, value
+        )
 
         # Determine if we should return a full response or just a boolean value
         if use_full_response:
-            return {"result": result}
+            return {"result": VALIDATE_RESULT_NAMES[result]}
         else:
             return {"result": result == ValidateResult.SUCCESS}
 
@@ -127,121 +259,344 @@ async def async_setup(hass: HomeAssistant, config: ConfigEntry) -> bool:
 class SecretValidatorService:
     """A class that stores secret/group configurations and can validate secrets."""
 
-    _group_validators: dict[str, SecretGroupValidator]
-    _individual_validators: dict[str, SecretValidator]
+    __slots__ = (
+        "_default_cost",
+        "_validators",
+        "_failed_attempts",
+        "_rate_buckets",
+        "_lock",
+    )
+
+    _default_cost: int | None
+    # The dispatch table and group names are stored together so a reload swaps them in
+    # with a single assignment
+    _validators: tuple[dict[str, Callable[[str], ValidateResult]], frozenset[str]]
+    _failed_attempts: dict[str, tuple[int, float]]
+    _rate_buckets: dict[str, tuple[float, float]]
+    _lock: threading.Lock
 
     def __init__(self, service_config: ConfigType) -> None:
         """Initialize the SecretValidatorService class."""
-        self._group_validators = {}
-        self._individual_validators = {}
+        self._failed_attempts = {}
+        self._rate_buckets = {}
+        self._lock = threading.Lock()
+        self._default_cost = None
         self._load_config(service_config)
 
     def reload(self, service_config: ConfigType) -> None:
         """Reload the service using the given configuration."""
-        self._group_validators.clear()
-        self._individual_validators.clear()
         self._load_config(service_config)
 
     def validate(self, name: str, value: str) -> ValidateResult:
         """Validate the provided value against the stored secrets/groups."""
         result: ValidateResult = ValidateResult.FAILED_INVALID
+        dispatch, group_names = self._validators
+        validate = dispatch.get(name)
 
-        if name in self._individual_validators:
-            LOGGER.debug("Name %s matches a single secret, validating", name)
-            result = self._individual_validators[name].validate(value)
-        elif name in self._group_validators:
-            LOGGER.debug("Name %s matches a group of secrets, validating", name)
-            result = self._group_validators[name].validate(value)
-        else:
+        if validate is None:
             LOGGER.debug("Name %s does not match any secrets", name)
+        elif (limited_result := self._check_limits(name)) is not None:
+            LOGGER.debug("Name %s has exceeded its limits", name)
+            result = limited_result
+        else:
+            LOGGER.debug("Name %s matches a secret or group, validating", name)
+            result = validate(value)
+            self._record_attempt(name, result, name in group_names)
 
-        LOGGER.debug("Validation result: %s", result)
+        LOGGER.debug("Validation result: %s", VALIDATE_RESULT_NAMES[result])
 
         return result
 
+    def _check_limits(self, name: str) -> ValidateResult | None:
+        """Check the attempt and rate limits for a name, reserving an attempt if allowed.
+
+        The attempt is counted as a failure up front so concurrent validations can't all
+        get past the limit before any of them finishes, _record_attempt releases it on success.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            failures, window_start = self._failed_attempts.get(name, (0, now))
+
+            if now - window_start >= FAILED_ATTEMPTS_WINDOW:
+                failures, window_start = 0, now
+            elif failures >= MAX_FAILED_ATTEMPTS:
+                return ValidateResult.FAILED_ATTEMPTS_EXCEEDED
+
+            tokens, last_update = self._rate_buckets.get(name, (RATE_LIMIT_BURST, now))
+            tokens = min(
+                RATE_LIMIT_BURST,
+                tokens + (now - last_update) * RATE_LIMIT_PER_SECOND,
+            )
+
+            if tokens < 1:
+                self._rate_buckets[name] = (tokens, now)
+                return ValidateResult.FAILED_RATE_EXCEEDED
+
+            self._rate_buckets[name] = (tokens - 1, now)
+            self._failed_attempts[name] = (failures + 1, window_start)
+
+        return None
+
+    def _record_attempt(
+        self, name: str, result: ValidateResult, is_group: bool
+    ) -> None:
+        # Failures were already counted when the attempt was reserved
+        if result != ValidateResult.SUCCESS:
+            return
+
+        with self._lock:
+            # A group name is shared by all of its secrets so knowing one of them
+            # must not reset the lockout, only the reserved attempt is released and
+            # group failures expire with the window
+            if not is_group:
+                self._failed_attempts.pop(name, None)
+            elif (attempt := self._failed_attempts.get(name)) is not None:
+                failures, window_start = attempt
+                self._failed_attempts[name] = (max(failures - 1, 0), window_start)
+
+    def _resolve_cost(
+        self, secret_config: ConfigType, group_cost: int | None = None
+    ) -> int | None:
+        """Get the bcrypt cost for a secret, calibrating the default the first time it's needed."""
+        if secret_config.get(ATTR_ALGORITHM, ALGORITHM_BCRYPT) != ALGORITHM_BCRYPT:
+            return None
+
+        cost: int | None = secret_config.get(ATTR_COST, group_cost)
+
+        if cost is None:
+            if self._default_cost is None:
+                self._default_cost = calibrate_bcrypt_cost()
+
+            cost = self._default_cost
+
+        return cost
+
     def _load_config(self, service_config: ConfigType) -> None:
         LOGGER.debug("Loading config")
-        group_configs: list[ConfigType] | None = service_config.get(ATTR_GROUPS)
-        secret_configs: list[ConfigType] | None = service_config.get(ATTR_SECRETS)
-
-        if group_configs:
-            for group_config in group_configs:
-                group_name = group_config.get(ATTR_GROUP)
-                self._group_validators[group_name] = SecretGroupValidator(group_config)
-
-        if secret_configs:
-            for secret_config in secret_configs:
-                secret_name = secret_config.get(ATTR_SECRET)
-                self._individual_validators[secret_name] = SecretValidator(
-                    secret_config
+        group_configs: list[ConfigType] = service_config.get(ATTR_GROUPS) or []
+        secret_configs: list[ConfigType] = service_config.get(ATTR_SECRETS) or []
+
+        # Resolve every cost before any hashing starts so that calibrating the default
+        # cost, if needed, doesn't compete with the pool for the CPU
+        group_costs: list[list[tuple[ConfigType, int | None]]] = [
+            [
+                (
+                    secret_config,
+                    self._resolve_cost(secret_config, group_config.get(ATTR_COST)),
                 )
+                for secret_config in group_config.get(ATTR_SECRETS) or []
+            ]
+            for group_config in group_configs
+        ]
+        secret_costs: list[tuple[ConfigType, int | None]] = [
+            (secret_config, self._resolve_cost(secret_config))
+            for secret_config in secret_configs
+        ]
+
+        # Build the new validators before swapping them in so validations running
+        # during a reload keep using the previous configuration. The hashing libraries
+        # release the GIL so every secret, including group members, is hashed in parallel
+        # on a single pool.
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            group_futures = [
+                [
+                    executor.submit(SecretValidator, secret_config, cost)
+                    for secret_config, cost in member_costs
+                ]
+                for member_costs in group_costs
+            ]
+            individual_futures = {
+                secret_config.get(ATTR_SECRET): executor.submit(
+                    SecretValidator, secret_config, cost
+                )
+                for secret_config, cost in secret_costs
+            }
+
+            group_validators = {
+                group_config.get(ATTR_GROUP): SecretGroupValidator(
+                    group_config, [future.result() for future in futures]
+                )
+                for group_config, futures in zip(group_configs, group_futures)
+            }
+            individual_validators = {
+                name: future.result() for name, future in individual_futures.items()
+            }
+
+        # Single secrets take priority over groups with the same name
+        self._validators = (
+            {name: validator.validate for name, validator in group_validators.items()}
+            | {
+                name: validator.validate
+                for name, validator in individual_validators.items()
+            },
+            frozenset(group_validators.keys() - individual_validators.keys()),
+        )
 
 
 class SecretGroupValidator:
     """A class for validating multiple secrets and storing configurations for those secrets."""
 
+    __slots__ = ("_name", "_salt", "_validators", "_max_length")
+
     _name: str
     _salt: bytes
     _validators: dict[bytes, SecretValidator]
+    _max_length: int
 
-    def __init__(self, group_config: ConfigType) -> None:
-        """Initialize the SecretGroupValidator class."""
-        secret_configs: list[ConfigType] = group_config.get(ATTR_SECRETS)
+    def __init__(
+        self, group_config: ConfigType, validators: list[SecretValidator]
+    ) -> None:
+        """Initialize the SecretGroupValidator class.
+
+        The validators must already be built, in the same order as the group's secrets.
+        """
+        secret_configs: list[ConfigType] = group_config.get(ATTR_SECRETS) or []
         name = group_config.get(ATTR_GROUP)
 
         self._name = name
-        self._salt = bcrypt.gensalt()
+        self._salt = secrets.token_bytes(32)
         self._validators = {}
+        self._max_length = MAX_VALUE_LENGTH
 
-        if secret_configs:
-            for secret_config in secret_configs:
-                # Hash the secret using the group id so we can easily lookup the validator
-                secret_value: str = secret_config.get(ATTR_VALUE)
-                key = self._generate_secret_key(secret_value)
-                self._validators[key] = SecretValidator(secret_config)
+        for secret_config, validator in zip(secret_configs, validators):
+            # Hash the secret using the group id so we can easily lookup the validator
+            secret_value: bytes = secret_config.get(ATTR_VALUE).encode()
+            key = self._generate_secret_key(secret_value)
+            self._validators[key] = validator
+            self._max_length = max(self._max_length, len(secret_value))
 
     def validate(self, value: str) -> ValidateResult:
         """Validate the provided value against the secrets in this group."""
+        return self.validate_bytes(value.encode())
+
+    def validate_bytes(self, value: bytes) -> ValidateResult:
+        """Validate the provided UTF-8 encoded value against the secrets in this group."""
+        if len(value) > self._max_length:
+            LOGGER.debug("Value is longer than any secret in the group")
+            return ValidateResult.FAILED_INVALID
+
         result: ValidateResult = ValidateResult.FAILED_INVALID
-        key = self._generate_secret_key(value)
+        validator = self._validators.get(self._generate_secret_key(value))
 
-        if key in self._validators:
+        # Successful values are cached by the matched validator so the group doesn't keep its own cache
+        if validator is not None:
             LOGGER.debug("Value matches known validator, performing validation")
-            result = self._validators[key].validate(value)
+            result = validator.validate_bytes(value)
         else:
             LOGGER.debug("Value does not match a known validator")
 
         return result
 
-    def _generate_secret_key(self, value: str) -> bytes:
-        return bcrypt.hashpw(value.encode(), self._salt)
+    def _generate_secret_key(self, value: bytes) -> bytes:
+        # The key is only used for lookup, the matched validator still verifies the value against its hash
+        return hmac.new(self._salt, value, "sha256").digest()
 
 
 class SecretValidator:
     """A class for checking a single secret and storing configuration for that secret."""
 
+    __slots__ = ("_name", "_hashed_secret", "_check_secret", "_max_length", "_cache")
+
     _name: str
-    _salt: bytes
     _hashed_secret: bytes
+    _check_secret: Callable[[bytes, bytes], bool]
+    _max_length: int
+    _cache: SuccessCache
 
-    def __init__(self, secret_config: ConfigType) -> None:
-        """Initialize the SecretValidator class."""
-        secret_value: str = secret_config.get(ATTR_VALUE)
+    def __init__(self, secret_config: ConfigType, cost: int | None) -> None:
+        """Initialize the SecretValidator class.
+
+        The cost is the resolved bcrypt cost factor and is ignored for other algorithms.
+        """
+        secret_value: bytes = secret_config.get(ATTR_VALUE).encode()
         secret_name: str = secret_config.get(ATTR_SECRET)
+        algorithm: str = secret_config.get(ATTR_ALGORITHM, ALGORITHM_BCRYPT)
 
         self._name = secret_name
-        self._salt = bcrypt.gensalt()
-        self._hashed_secret = self._generate_hashed_secret(secret_value)
+        self._max_length = max(MAX_VALUE_LENGTH, len(secret_value))
+        self._cache = SuccessCache()
+
+        # The hashing libraries are imported here, once, so they are only loaded when
+        # secrets are actually configured and validate never runs an import
+        if algorithm == ALGORITHM_ARGON2:
+            self._hashed_secret = get_argon2_hasher().hash(secret_value).encode()
+            self._check_secret = get_argon2_checker()
+        else:
+            import bcrypt
+
+            self._hashed_secret = bcrypt.hashpw(
+                secret_value, bcrypt.gensalt(rounds=cost)
+            )
+            # checkpw reads the salt from the stored hash and compares in constant time
+            self._check_secret = bcrypt.checkpw
+
+            # bcrypt ignores anything past 72 bytes so a longer value can never be a
+            # real match for a secret that fits within the limit
+            if len(secret_value) <= BCRYPT_MAX_LENGTH:
+                self._max_length = BCRYPT_MAX_LENGTH
 
     def validate(self, value: str) -> ValidateResult:
         """Validate the provided value against the secret."""
+        return self.validate_bytes(value.encode())
+
+    def validate_bytes(self, value: bytes) -> ValidateResult:
+        """Validate the provided UTF-8 encoded value against the secret."""
+        if len(value) > self._max_length:
+            return ValidateResult.FAILED_INVALID
+
+        if self._cache.contains(value):
+            return ValidateResult.SUCCESS
+
         result: ValidateResult = ValidateResult.FAILED_INVALID
-        hashed_value = self._generate_hashed_secret(value)
 
-        if self._hashed_secret == hashed_value:
+        if self._check_secret(value, self._hashed_secret):
             result = ValidateResult.SUCCESS
+            self._cache.add(value)
 
         return result
 
-    def _generate_hashed_secret(self, value: str) -> bytes:
-        return bcrypt.hashpw(value.encode(), self._salt)
+
+class SuccessCache:
+    """A small LRU cache of values that were recently validated successfully.
+
+    Only successful validations are cached so failed attempts always pay the full
+    hashing cost. Values are keyed by an HMAC so the plain text is never stored.
+    """
+
+    __slots__ = ("_key", "_expiries")
+
+    _key: bytes
+    _expiries: dict[bytes, float]
+
+    def __init__(self) -> None:
+        """Initialize the SuccessCache class."""
+        self._key = secrets.token_bytes(32)
+        self._expiries = {}
+
+    def contains(self, value: bytes) -> bool:
+        """Check if the value was validated successfully within the cache TTL."""
+        key = self._generate_cache_key(value)
+        expiry = self._expiries.get(key)
+
+        if expiry is None:
+            return False
+
+        if expiry < time.monotonic():
+            self._expiries.pop(key, None)
+            return False
+
+        return True
+
+    def add(self, value: bytes) -> None:
+        """Store a successfully validated value, evicting the oldest entry if full."""
+        key = self._generate_cache_key(value)
+        self._expiries.pop(key, None)
+
+        if len(self._expiries) >= CACHE_MAX_SIZE:
+            self._expiries.pop(next(iter(self._expiries)), None)
+
+        self._expiries[key] = time.monotonic() + CACHE_TTL
+
+    def _generate_cache_key(self, value: bytes) -> bytes:
+        return hmac.new(self._key, value, "sha256").digest()
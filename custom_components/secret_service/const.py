@@ -1,6 +1,6 @@
 """Constants for secret_service."""
+from enum import IntEnum
 from logging import Logger, getLogger
-from homeassistant.backports.enum import StrEnum
 
 LOGGER: Logger = getLogger(__package__)
 DOMAIN = "secret_service"
@@ -13,14 +13,56 @@ ATTR_SECRETS = "secrets"
 ATTR_GROUP = "group"
 ATTR_GROUPS = "groups"
 ATTR_FULL_RESPONSE = "full_response"
+ATTR_ALGORITHM = "algorithm"
+ATTR_COST = "cost"
+
+ALGORITHM_BCRYPT = "bcrypt"
+ALGORITHM_ARGON2 = "argon2"
 
 SERVICE_CHECK_SECRET = "check_secret"
 
+CACHE_MAX_SIZE = 128
+CACHE_TTL = 300
+
+# Values longer than this (in bytes) are rejected before hashing unless a configured
+# secret is longer. bcrypt only uses the first 72 bytes of a value.
+MAX_VALUE_LENGTH = 256
+BCRYPT_MAX_LENGTH = 72
+
+# Bounds for the bcrypt cost factor and the hashing time the default cost is calibrated to
+BCRYPT_MIN_COST = 4
+BCRYPT_MAX_COST = 15
+BCRYPT_MAX_CALIBRATED_COST = 12
+BCRYPT_CALIBRATION_TARGET_MS = 50
+BCRYPT_CALIBRATION_SAMPLES = 3
+
+# After this many failed attempts within the window a name is locked until the window ends
+MAX_FAILED_ATTEMPTS = 10
+FAILED_ATTEMPTS_WINDOW = 60
+
+# Token bucket limiting how often a single name can be checked
+RATE_LIMIT_BURST = 10
+RATE_LIMIT_PER_SECOND = 1.0
 
-class ValidateResult(StrEnum):
+# OWASP recommended Argon2id parameters (46 MiB, 1 iteration, 1 lane)
+ARGON2_MEMORY_COST = 47104
+ARGON2_TIME_COST = 1
+ARGON2_PARALLELISM = 1
+
+
+class ValidateResult(IntEnum):
     """Enum that represents the result of a validation attempt."""
 
-    SUCCESS = "success"
-    FAILED_INVALID = "failed_invalid"
-    FAILED_ATTEMPTS_EXCEEDED = "failed_attempts_exceeded"
-    FAILED_RATE_EXCEEDED = "failed_rate_exceeded"
+    SUCCESS = 0
+    FAILED_INVALID = 1
+    FAILED_ATTEMPTS_EXCEEDED = 2
+    FAILED_RATE_EXCEEDED = 3
+
+
+# The result codes returned by the check_secret service when using a full response
+VALIDATE_RESULT_NAMES: dict[ValidateResult, str] = {
+    ValidateResult.SUCCESS: "success",
+    ValidateResult.FAILED_INVALID: "failed_invalid",
+    ValidateResult.FAILED_ATTEMPTS_EXCEEDED: "failed_attempts_exceeded",
+    ValidateResult.FAILED_RATE_EXCEEDED: "failed_rate_exceeded",
+}